@@ -1,7 +1,9 @@
 import json
+import os
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
 import vcdb
 
@@ -37,11 +39,18 @@ class TestVcdb(unittest.TestCase):
             dat_path = build_dir / "mymod.dat"
             self.assertTrue(dat_path.exists())
 
-            # Dat should be valid JSON with expected shape
-            data = json.loads(dat_path.read_text(encoding="utf-8"))
+            # Dat should round-trip with expected shape
+            data = vcdb.read_db(dat_path)
             self.assertIn("entries", data)
             self.assertIn("vocab", data)
-            self.assertIn("vectors", data)
+            for key in ("indptr", "indices", "data", "norms"):
+                self.assertIn(key, data)
+            self.assertEqual(len(data["indptr"]), len(data["entries"]) + 1)
+
+            # Entry texts can be left on disk and fetched by opcode
+            lazy = vcdb.read_db(dat_path, lazy_entries=True)
+            self.assertNotIn("entries", lazy)
+            self.assertEqual(vcdb.read_entries(dat_path, lazy, [1]), [data["entries"][1]])
 
             # Search should return enriched result fields. Use internal `_search`
             # so we can supply a module map from our temp `vector-categories.txt`.
@@ -56,6 +65,191 @@ class TestVcdb(unittest.TestCase):
             self.assertEqual(r0["module_id"], 0)
             self.assertIsInstance(r0["signature"], str)
 
+    def test_search_reloads_rewritten_dat(self):
+        with tempfile.TemporaryDirectory() as td:
+            td = Path(td)
+            src = td / "mymod.txt"
+            dat_path = td / "vectors" / "mymod.dat"
+
+            src.write_text("add | Adds two numbers.\n\nprint | Prints a value.\n", encoding="utf-8")
+            vcdb.vectorize_file(src, dat_path.parent)
+            self.assertEqual(vcdb._search("add", str(dat_path), 1, {})[0]["opcode"], 0)
+            self.assertIs(vcdb.load_db(dat_path), vcdb.load_db(dat_path))
+
+            src.write_text("print | Prints a value.\n\nadd | Adds two or more numbers.\n", encoding="utf-8")
+            vcdb.vectorize_file(src, dat_path.parent)
+            self.assertEqual(vcdb._search("add", str(dat_path), 1, {})[0]["opcode"], 1)
+
+    def test_read_entries_rejects_replaced_dat(self):
+        with tempfile.TemporaryDirectory() as td:
+            td = Path(td)
+            src = td / "mymod.txt"
+            build_dir = td / "vectors"
+            dat_path = build_dir / "mymod.dat"
+
+            src.write_text("add | Adds two numbers.\n\nprint | Prints a value.\n", encoding="utf-8")
+            vcdb.vectorize_file(src, build_dir)
+            old = vcdb.read_db(dat_path, lazy_entries=True)
+            old_key = vcdb._file_key(str(dat_path))
+            vcdb._load_db(*old_key)
+
+            src.write_text("sub | Subtracts.\n\nprint | Prints a value.\n", encoding="utf-8")
+            vcdb.vectorize_file(src, build_dir)
+            # Rewrites are atomic: no temp files are left next to the .dat
+            self.assertEqual([p.name for p in build_dir.iterdir()], ["mymod.dat"])
+            # ...and keep the permissions a plain open() would have given
+            umask = os.umask(0)
+            os.umask(umask)
+            self.assertEqual(dat_path.stat().st_mode & 0o777, 0o666 & ~umask)
+            # Offsets from the old header must not be applied to the new file
+            with self.assertRaises(ValueError):
+                vcdb.read_entries(dat_path, old, [0])
+            # ...but a search still holding the old key reloads the file once
+            hits = vcdb._search_hits(("subtracts",), old_key, old_key, 1)
+            self.assertEqual(hits[0][2].split(" | ")[0], "sub")
+            self.assertEqual(vcdb._search("subtracts", str(dat_path), 1, {})[0]["op_name"], "sub")
+
+    def test_search_all_sees_new_dat(self):
+        with tempfile.TemporaryDirectory() as td:
+            td = Path(td)
+            build_dir = td / "vectors"
+            (td / "math.txt").write_text("add | Adds two numbers.\n\nsub | Subtracts numbers.\n", encoding="utf-8")
+            (td / "io.txt").write_text("print | Prints a value.\n\nread | Reads a line.\n", encoding="utf-8")
+
+            vcdb.vectorize_file(td / "math.txt", build_dir)
+            self.assertEqual(vcdb.search_all("prints", build_dir)[0]["database"], "math")
+
+            vcdb.vectorize_file(td / "io.txt", build_dir)
+            r0 = vcdb.search_all("prints", build_dir)[0]
+            self.assertEqual((r0["database"], r0["op_name"]), ("io", "print"))
+
+    def test_search_all_missing_build_dir(self):
+        with tempfile.TemporaryDirectory() as td:
+            self.assertEqual(vcdb.search_all("add", Path(td) / "does-not-exist"), [])
+
+    def test_search_all_threads_uncached_loads(self):
+        with tempfile.TemporaryDirectory() as td:
+            td = Path(td)
+            source_dir = td / "source"
+            build_dir = td / "vectors"
+            source_dir.mkdir()
+            (source_dir / "math.txt").write_text("add | Adds two numbers.\n\nsub | Subtracts numbers.\n", encoding="utf-8")
+            (source_dir / "io.txt").write_text("print | Prints a value.\n\nread | Reads a line.\n", encoding="utf-8")
+            vcdb.vectorize_all(source_dir, build_dir)
+
+            pool = mock.Mock(wraps=vcdb.ThreadPoolExecutor)
+            with mock.patch.object(vcdb, "PARALLEL_LOAD_BYTES", 0), mock.patch.object(vcdb, "ThreadPoolExecutor", pool):
+                r0 = vcdb.search_all("subtracts", build_dir)[0]
+                self.assertEqual((r0["database"], r0["op_name"]), ("math", "sub"))
+                self.assertEqual(pool.call_count, 1)
+
+                # Both databases are cached now, so the next query loads nothing
+                vcdb.search_all("prints", build_dir)
+                self.assertEqual(pool.call_count, 1)
+
+    def test_vectorize_all_shares_vocab(self):
+        with tempfile.TemporaryDirectory() as td:
+            td = Path(td)
+            source_dir = td / "source"
+            build_dir = td / "vectors"
+            source_dir.mkdir()
+            (source_dir / "math.txt").write_text("add | Adds two numbers.\n\nsub | Subtracts numbers.\n", encoding="utf-8")
+            (source_dir / "io.txt").write_text("print | Prints a value.\n\nread | Reads a line.\n", encoding="utf-8")
+
+            vcdb.vectorize_all(source_dir, build_dir)
+
+            # vocab.json is swapped in atomically too: no temp files remain
+            self.assertEqual(sorted(p.name for p in build_dir.iterdir()), ["io.dat", "math.dat", vcdb.VOCAB_FILE])
+            vocab = json.loads((build_dir / vcdb.VOCAB_FILE).read_text(encoding="utf-8"))
+            self.assertIn("prints", vocab["vocab"])
+            self.assertIn("adds", vocab["vocab"])
+            for name in ("math.dat", "io.dat"):
+                data = vcdb.read_db(build_dir / name)
+                self.assertNotIn("vocab", data)
+                self.assertEqual(data["vocab_file"], vcdb.VOCAB_FILE)
+
+            self.assertEqual(vcdb._search("read a line", build_dir / "io.dat", 1, {})[0]["op_name"], "read")
+            r0 = vcdb.search_all("subtracts", build_dir)[0]
+            self.assertEqual((r0["database"], r0["op_name"]), ("math", "sub"))
+
+    def test_vectorize_all_process_pool_matches_serial(self):
+        with tempfile.TemporaryDirectory() as td:
+            td = Path(td)
+            source_dir = td / "source"
+            source_dir.mkdir()
+            (source_dir / "math.txt").write_text("add | Adds two numbers.\n\nsub | Subtracts numbers.\n", encoding="utf-8")
+            (source_dir / "io.txt").write_text("print | Prints a value.\n\nread | Reads a line.\n", encoding="utf-8")
+
+            vcdb.vectorize_all(source_dir, td / "serial")
+            with mock.patch.object(vcdb, "PARALLEL_VECTORIZE_BYTES", 0), \
+                    mock.patch.object(vcdb.os, "cpu_count", return_value=2), \
+                    mock.patch.object(vcdb, "ProcessPoolExecutor", wraps=vcdb.ProcessPoolExecutor) as pool:
+                vcdb.vectorize_all(source_dir, td / "pooled")
+            pool.assert_called_once()
+
+            for name in ("io.dat", "math.dat", vcdb.VOCAB_FILE):
+                self.assertEqual((td / "pooled" / name).read_bytes(), (td / "serial" / name).read_bytes())
+
+    def test_vectorize_all_after_removing_source(self):
+        with tempfile.TemporaryDirectory() as td:
+            td = Path(td)
+            source_dir = td / "source"
+            build_dir = td / "vectors"
+            source_dir.mkdir()
+            (source_dir / "aaa.txt").write_text("alpha | apple banana cherry.\n\nkiwi | kiwi lemon.\n", encoding="utf-8")
+            (source_dir / "bbb.txt").write_text("beta | dog elephant fox.\n\ngamma | goat horse.\n", encoding="utf-8")
+            vcdb.vectorize_all(source_dir, build_dir)
+            # A self-contained database made on its own is not touched by rebuilds
+            (td / "own.txt").write_text("own | kiwi smoothie.\n", encoding="utf-8")
+            vcdb.vectorize_file(td / "own.txt", build_dir)
+
+            # Rebuilding without aaa.txt shifts every term id; the leftover aaa.dat
+            # is rejected, not scored against the new vocab
+            (source_dir / "aaa.txt").unlink()
+            vcdb.vectorize_all(source_dir, build_dir)
+            self.assertTrue((build_dir / "aaa.dat").exists())
+            with self.assertRaises(ValueError):
+                vcdb._search("kiwi", build_dir / "aaa.dat", 1, {})
+            self.assertEqual({r["database"] for r in vcdb.search_all("kiwi", build_dir, top_k=5)}, {"bbb", "own"})
+            self.assertEqual(vcdb._search("kiwi", build_dir / "own.dat", 1, {})[0]["op_name"], "own")
+
+            # Without vocab.json only the self-contained database is searchable
+            (build_dir / vcdb.VOCAB_FILE).unlink()
+            with self.assertRaises(ValueError):
+                vcdb._search("goat", build_dir / "bbb.dat", 1, {})
+            self.assertEqual({r["database"] for r in vcdb.search_all("kiwi", build_dir, top_k=5)}, {"own"})
+
+    def test_search_legacy_dict_vectors(self):
+        with tempfile.TemporaryDirectory() as td:
+            dat_path = Path(td) / "mymod.dat"
+            entries = ["add | Adds two numbers. Parameters: a, b.", "print | Prints a value."]
+            data = vcdb.build_tfidf(entries)
+            # Rewrite as the pre-CSR layout: one {"index": value} dict per entry
+            indptr, indices, values = data.pop("indptr"), data.pop("indices"), data.pop("data")
+            data.pop("norms")
+            data["vectors"] = [
+                {str(indices[j]): values[j] for j in range(indptr[i], indptr[i + 1])}
+                for i in range(len(entries))
+            ]
+            data["entries"] = entries
+            dat_path.write_text(json.dumps(data), encoding="utf-8")
+
+            results = vcdb._search("add numbers", str(dat_path), top_k=1, module_map={})
+            self.assertEqual(results[0]["op_name"], "add")
+            self.assertGreater(results[0]["similarity"], 0)
+
+    def test_cosine_sim(self):
+        small = {"1": 1.0, "2": 2.0}
+        big = {"2": 3.0, "5": 1.0, "7": 2.0}
+        expected = 6.0 / (5 ** 0.5 * 14 ** 0.5)
+        # Symmetric regardless of which side is smaller
+        self.assertAlmostEqual(vcdb.cosine_sim(small, big), expected)
+        self.assertAlmostEqual(vcdb.cosine_sim(big, small), expected)
+        # Precomputed norms are used as given instead of being recomputed
+        self.assertAlmostEqual(vcdb.cosine_sim(small, big, n1=1.0, n2=2.0), 3.0)
+        self.assertEqual(vcdb.cosine_sim({}, big), 0)
+        self.assertEqual(vcdb.cosine_sim({"1": 1.0}, {"2": 1.0}), 0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -3,14 +3,39 @@ Zero-dependency TF-IDF vector database for MCP tools.
 Builds and searches .dat files using pure Python.
 """
 
-import json, math, re
-from functools import lru_cache
+import hashlib, heapq, json, math, os, re, struct, sys, tempfile, threading
+from array import array
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import islice, repeat
+from operator import mul
 from pathlib import Path
 
+# Binary .dat layout: magic, u32 header length, JSON header, then the numeric
+# arrays back to back (little-endian) in the order listed in header["arrays"],
+# then the UTF-8 entry texts, entry i spanning entry_offsets[i:i+2] of that blob.
+# Weights are stored as uint16 multiples of header["scale"]; norms are in the
+# same units, and cosine similarity does not depend on the scale.
+DAT_MAGIC = b"VCDB\x01"
+DAT_ARRAYS = (("indptr", "I"), ("indices", "I"), ("data", "H"), ("norms", "d"))
+QUANT_MAX = 65535
+
+# vectorize_all spreads files over processes once the sources total this many bytes
+PARALLEL_VECTORIZE_BYTES = 4 << 20
+
+# search_all reads uncached databases concurrently once they total this many bytes
+PARALLEL_LOAD_BYTES = 1 << 20
+
+# Shared vocab/IDF written next to the .dat files by vectorize_all
+VOCAB_FILE = "vocab.json"
+
+_TOKEN_RE = re.compile(r'[A-Za-z0-9_]+')
+
 
 def tokenize(text):
-    """Split text into lowercase words."""
-    return re.findall(r'\w+', text.lower())
+    """Split text into lowercase ASCII words."""
+    return _TOKEN_RE.findall(text.lower())
 
 
 @lru_cache(maxsize=1)
@@ -96,72 +121,428 @@ def enrich_result(entry, opcode, similarity, database, module_map):
     }
 
 
-def build_tfidf(entries):
-    """Build TF-IDF vectors for all entries."""
-    docs = [tokenize(e) for e in entries]
+def _term_counts(docs, word_idx):
+    """Per-doc TF dicts over term ids, plus DF counted in the same pass."""
+    df = [0] * len(word_idx)
+    tfs = []
+    for d in docs:
+        tf = {word_idx[w]: c for w, c in Counter(d).items() if w in word_idx}
+        for i in tf:
+            df[i] += 1
+        tfs.append(tf)
+    return tfs, df
+
+
+def _idf(df, N):
+    """IDF per term id: log(N / docs_containing_word), 0 for unseen terms."""
+    log_N = math.log(N) if N else 0.0
+    return [log_N - math.log(c) if c else 0 for c in df]
+
+
+def build_global_vocab(source_dir):
+    """
+    Build one vocab and IDF table over every entry of every .txt in source_dir,
+    so databases vectorized against it can share a single query vector.
+    """
+    docs = [tokenize(e) for f in sorted(Path(source_dir).glob('*.txt')) for e in _read_entries(f)]
     vocab = sorted(set(w for d in docs for w in d))
-    word_idx = {w: i for i, w in enumerate(vocab)}
-    
+    _, df = _term_counts(docs, {w: i for i, w in enumerate(vocab)})
+    idf = _idf(df, len(docs))
+    return {'vocab': vocab, 'idf': idf, 'vocab_id': _vocab_id(vocab, idf)}
+
+
+def _vocab_id(vocab, idf):
+    """Fingerprint of a shared vocab; .dat files record it to detect a rebuilt vocab."""
+    digest = hashlib.sha1(json.dumps([vocab, idf]).encode("utf-8")).hexdigest()
+    return f"{len(vocab)}-{digest[:16]}"
+
+
+def build_tfidf(entries, vocab=None):
+    """
+    Build TF-IDF vectors for all entries.
+
+    With a shared vocab (see build_global_vocab) terms are indexed and weighted
+    against it, and the result carries no vocab/idf of its own.
+    """
+    docs = [tokenize(e) for e in entries]
+    terms = vocab['vocab'] if vocab is not None else sorted(set(w for d in docs for w in d))
+    word_idx = {w: i for i, w in enumerate(terms)}
+
+    # TF per doc; DF falls out of the same pass as one count per distinct term
+    tfs, df = _term_counts(docs, word_idx)
+
     # IDF: log(N / docs_containing_word)
-    N = len(docs)
-    df = {w: sum(1 for d in docs if w in d) for w in vocab}
-    idf = {w: math.log(N / df[w]) if df[w] else 0 for w in vocab}
-    
-    # TF-IDF sparse vectors (only non-zero values, keys as strings for JSON)
-    vectors = []
-    for doc in docs:
-        if not doc:
-            vectors.append({})
-            continue
-        tf = {}
-        for w in doc:
-            tf[w] = tf.get(w, 0) + 1
-        vec = {str(word_idx[w]): (tf[w] / len(doc)) * idf[w] for w in tf}
-        vectors.append(vec)
-    
-    return {'vocab': vocab, 'idf': idf, 'vectors': vectors}
+    if vocab is not None:
+        idf_list = vocab['idf']
+    else:
+        idf_list = _idf(df, len(docs))
+
+    # TF-IDF sparse vectors in CSR form: row d holds indices/data[indptr[d]:indptr[d+1]]
+    indptr, indices, data, norms = [0], [], [], []
+    for tf in tfs:
+        inv_len = 1.0 / sum(tf.values()) if tf else 0.0
+        row = [(i, c * inv_len * idf_list[i]) for i, c in sorted(tf.items())]
+        indices.extend(i for i, _ in row)
+        data.extend(v for _, v in row)
+        indptr.append(len(indices))
+        norms.append(math.sqrt(sum(v * v for _, v in row)))
+
+    result = {
+        'indptr': indptr,
+        'indices': indices,
+        'data': data,
+        'norms': norms,
+    }
+    if vocab is None:
+        result = {'vocab': terms, 'idf': idf_list, **result}
+    return result
+
+
+def _vectors_to_csr(vectors):
+    """Convert legacy per-entry {"index": value} dicts to CSR arrays."""
+    indptr, indices, data, norms = [0], [], [], []
+    for vec in vectors:
+        row = sorted((int(k), v) for k, v in vec.items())
+        indices.extend(i for i, _ in row)
+        data.extend(v for _, v in row)
+        indptr.append(len(indices))
+        norms.append(math.sqrt(sum(v * v for _, v in row)))
+    return {'indptr': indptr, 'indices': indices, 'data': data, 'norms': norms}
+
 
+def cosine_sim(v1, v2, n1=None, n2=None):
+    """
+    Cosine similarity between sparse vectors (dicts).
 
-def cosine_sim(v1, v2):
-    """Cosine similarity between sparse vectors (dicts)."""
-    keys = set(v1) | set(v2)
-    dot = sum(v1.get(k, 0) * v2.get(k, 0) for k in keys)
-    n1 = math.sqrt(sum(x*x for x in v1.values())) if v1 else 0
-    n2 = math.sqrt(sum(x*x for x in v2.values())) if v2 else 0
+    A standalone helper kept for API compatibility; search itself scores
+    CSR rows with _score_csr. Pass precomputed norms as n1/n2 to skip
+    recomputing them.
+    """
+    # Only keys present on both sides contribute; walk the smaller dict.
+    small, big = (v1, v2) if len(v1) <= len(v2) else (v2, v1)
+    dot = 0.0
+    for k, x in small.items():
+        y = big.get(k)
+        if y:
+            dot += x * y
+    if n1 is None:
+        n1 = math.sqrt(sum(x*x for x in v1.values())) if v1 else 0
+    if n2 is None:
+        n2 = math.sqrt(sum(x*x for x in v2.values())) if v2 else 0
     return dot / (n1 * n2) if n1 and n2 else 0
 
 
-def _search(query, db_path, top_k, module_map):
-    """Internal search that reuses a provided module_id map."""
-    db_path = Path(db_path)
-    database = db_path.stem
+def _quantize(indptr, data):
+    """Scale weights to uint16; returns (data, norms, scale) with norms recomputed."""
+    vmax = max(data, default=0)
+    scale = vmax / QUANT_MAX if vmax > 0 else 1.0
+    qdata = [round(v / scale) for v in data]
+    norms = [
+        math.sqrt(sum(x * x for x in qdata[lo:hi]))
+        for lo, hi in zip(indptr, indptr[1:])
+    ]
+    return qdata, norms, scale
+
+
+def write_db(path, data):
+    """Write a database dict (as built by vectorize_file) in the binary .dat layout."""
+    data = dict(data)
+    data["data"], data["norms"], data["scale"] = _quantize(data["indptr"], data["data"])
+
+    # Entry texts go after the arrays so searches can read just the top hits
+    texts = [e.encode("utf-8") for e in data.pop("entries")]
+    entry_offsets = array("I", [0])
+    for t in texts:
+        entry_offsets.append(entry_offsets[-1] + len(t))
+
+    arrays = [(name, array(code, data[name])) for name, code in DAT_ARRAYS]
+    arrays.append(("entry_offsets", entry_offsets))
+    header = {k: v for k, v in data.items() if k not in dict(DAT_ARRAYS)}
+    header["arrays"] = [[name, arr.typecode, len(arr)] for name, arr in arrays]
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+
+    def write(f):
+        f.write(DAT_MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for _, arr in arrays:
+            if sys.byteorder == "big":
+                arr.byteswap()
+            arr.tofile(f)
+        f.write(b"".join(texts))
+
+    _atomic_write(path, write)
+
+
+def _atomic_write(path, write):
+    """
+    Call write(f) on a binary temp file beside path, then swap it into place,
+    so readers never see a partially written file.
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        # mkstemp creates 0600; give the file the mode open() would have
+        os.chmod(tmp, _new_file_mode(path))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _new_file_mode(path):
+    """Mode for a rewritten file: the existing target's, else 0666 less the umask."""
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def _file_version(st):
+    """Fields of an os.stat result that change when a .dat is rewritten or replaced."""
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def read_db(path, lazy_entries=False):
+    """
+    Read a .dat file; JSON files from older builds are still accepted.
+
+    With lazy_entries the entry texts are left on disk; fetch them with
+    read_entries.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(DAT_MAGIC)) != DAT_MAGIC:
+            f.seek(0)
+            db = json.loads(f.read().decode("utf-8"))
+            # Databases written before the CSR layout store one dict per entry
+            if "vectors" in db:
+                db.update(_vectors_to_csr(db["vectors"]))
+            # ...and IDF as a {word: idf} dict rather than a list aligned with vocab
+            if isinstance(db.get("idf"), dict):
+                db["idf"] = [db["idf"].get(w, 0) for w in db["vocab"]]
+            return db
+
+        (header_len,) = struct.unpack("<I", f.read(4))
+        db = json.loads(f.read(header_len).decode("utf-8"))
+        for name, code, length in db.pop("arrays"):
+            arr = array(code)
+            arr.frombytes(f.read(length * arr.itemsize))
+            if sys.byteorder == "big":
+                arr.byteswap()
+            db[name] = arr
+
+        if "entry_offsets" in db:
+            db["_entries_pos"] = f.tell()
+            db["_version"] = _file_version(os.fstat(f.fileno()))
+            if not lazy_entries:
+                blob = f.read()
+                offsets = db["entry_offsets"]
+                db["entries"] = [
+                    blob[lo:hi].decode("utf-8") for lo, hi in zip(offsets, islice(offsets, 1, None))
+                ]
+        return db
+
+
+def read_entries(path, db, ids):
+    """Entry texts for the given opcodes, reading only their bytes from the .dat."""
+    if "entries" in db:
+        return [db["entries"][i] for i in ids]
+
+    offsets = db["entry_offsets"]
+    base = db["_entries_pos"]
+    texts = []
+    with open(path, "rb") as f:
+        # The offsets belong to the file version the header was read from
+        if _file_version(os.fstat(f.fileno())) != db["_version"]:
+            raise ValueError(f"{path} changed since it was loaded; search again")
+        for i in ids:
+            f.seek(base + offsets[i])
+            texts.append(f.read(offsets[i + 1] - offsets[i]).decode("utf-8"))
+    return texts
+
+
+# Parsed databases keyed by _file_key, least recently used first. A plain LRU
+# dict rather than lru_cache so search_all can tell which files are cached.
+_DB_CACHE = OrderedDict()
+_DB_CACHE_SIZE = 32
+_DB_CACHE_LOCK = threading.Lock()
+
+
+def _load_db(path_str, ino, mtime_ns, size):
+    """
+    Parse a .dat file. Cached per (path, inode, mtime_ns, size) so an edited or
+    replaced file is re-read; callers must treat the returned dict as read-only.
+    """
+    key = (path_str, ino, mtime_ns, size)
+    with _DB_CACHE_LOCK:
+        db = _DB_CACHE.get(key)
+        if db is not None:
+            _DB_CACHE.move_to_end(key)
+            return db
+
+    db = _parse_db(path_str)
+    with _DB_CACHE_LOCK:
+        db = _DB_CACHE.setdefault(key, db)
+        _DB_CACHE.move_to_end(key)
+        while len(_DB_CACHE) > _DB_CACHE_SIZE:
+            _DB_CACHE.popitem(last=False)
+    return db
+
+
+def _parse_db(path_str):
+    """read_db plus the lookup tables searches need, built once per load."""
+    db = read_db(path_str, lazy_entries=True)
+    if "vocab" in db:
+        # Interned so databases with their own vocab share one copy of each term
+        db["vocab"] = [sys.intern(w) for w in db["vocab"]]
+        db["_word_idx"] = {w: i for i, w in enumerate(db["vocab"])}
+    if "indptr" in db:
+        db["_postings"] = _postings(db["indptr"], db["indices"])
+    return db
+
+
+def _file_key(path):
+    """(path, inode, mtime_ns, size): identifies one version of a file for the caches."""
+    path_str = str(path)
+    return (path_str, *_file_version(os.stat(path_str)))
+
+
+def load_db(db_path):
+    """Load a .dat database, reusing the parsed copy while the file is unchanged."""
+    return _load_db(*_file_key(db_path))
+
+
+def _vocab_path(db_path, db):
+    """File holding a database's vocab: the shared vocab file, or the .dat itself."""
+    if "vocab_file" in db:
+        return str(Path(db_path).parent / db["vocab_file"])
+    return str(db_path)
+
+
+def _postings(indptr, indices):
+    """Inverted index of CSR rows: term_id -> ascending list of row ids containing it."""
+    postings = {}
+    for d, (lo, hi) in enumerate(zip(indptr, islice(indptr, 1, None))):
+        for t in indices[lo:hi]:
+            postings.setdefault(t, []).append(d)
+    return postings
+
+
+def _score_csr(indptr, indices, data, norms, q_vec, q_norm, rows):
+    """Cosine similarity of the given CSR rows against a sparse {term_id: weight} query."""
+    if not q_norm:
+        return [0] * len(rows)
+    get = q_vec.get
+    scores = []
+    for d in rows:
+        lo, hi = indptr[d], indptr[d + 1]
+        dot = sum(map(mul, data[lo:hi], map(get, indices[lo:hi], repeat(0.0))))
+        scores.append(dot / (norms[d] * q_norm) if norms[d] else 0)
+    return scores
+
+
+@lru_cache(maxsize=256)
+def _query_vector(words, vocab_key):
+    """Sparse {term_id: weight} query vector and its norm against a vocab file version."""
+    vocab = _load_db(*vocab_key)
+    word_idx = vocab["_word_idx"]
+    idf = vocab["idf"]
+
+    tf = Counter(w for w in words if w in word_idx)
+    inv_len = 1.0 / len(words)
+    q_vec = {word_idx[w]: c * inv_len * idf[word_idx[w]] for w, c in tf.items()}
+    q_norm = math.sqrt(sum(x * x for x in q_vec.values()))
+    return q_vec, q_norm
+
+
+def _rank(words, db, vocab_key, top_k):
+    """Top opcodes of a loaded database for a query, and their nonzero scores."""
+    q_vec, q_norm = _query_vector(words, vocab_key)
+
+    # Only rows sharing a term with the query can score above zero
+    postings = db["_postings"]
+    candidates = sorted(set().union(*(postings[t] for t in q_vec if t in postings)))
+    scores = _score_csr(db["indptr"], db["indices"], db["data"], db["norms"], q_vec, q_norm, candidates)
+    hits = {i: s for i, s in zip(candidates, scores) if s > 0}
+    top = heapq.nlargest(top_k, hits, key=hits.__getitem__)
+
+    # Pad with zero-score entries in opcode order, as a full scan would
+    if len(top) < top_k:
+        misses = (i for i in range(len(db["norms"])) if i not in hits)
+        top.extend(islice(misses, top_k - len(top)))
+    return top, hits
+
+
+@lru_cache(maxsize=1024)
+def _search_hits(words, db_key, vocab_key, top_k):
+    """
+    Top (opcode, similarity, entry) hits of one database version for a query.
+    Cached, so a repeated query against unchanged files skips scoring.
+    """
+    db_path = db_key[0]
+    db = _load_db(*db_key)
+    top, hits = _rank(words, db, vocab_key, top_k)
+    try:
+        entries = read_entries(db_path, db, top)
+    except ValueError:
+        # The .dat was rebuilt since db_key was taken: reload it once and rescore
+        db = _load_db(*_file_key(db_path))
+        vocab_key = _vocab_key(db_path, db)
+        if vocab_key is None:
+            raise _vocab_error(db_path, db)
+        top, hits = _rank(words, db, vocab_key, top_k)
+        entries = read_entries(db_path, db, top)
+    return tuple((i, hits.get(i, 0), entry) for i, entry in zip(top, entries))
+
+
+def _query_words(query):
+    """Query tokens in a canonical order; a query's TF-IDF vector ignores word order."""
+    return tuple(sorted(tokenize(query)))
+
+
+def _vocab_key(db_path, db):
+    """
+    _file_key of the vocab a loaded database indexes into, or None when its
+    shared vocab file is missing or comes from a different build.
+    """
+    try:
+        vocab_key = _file_key(_vocab_path(db_path, db))
+    except FileNotFoundError:
+        return None
+    if "vocab_file" in db and db.get("vocab_id") != _load_db(*vocab_key).get("vocab_id"):
+        return None
+    return vocab_key
 
-    with open(db_path, encoding="utf-8") as f:
-        db = json.load(f)
 
-    words = tokenize(query)
-    if not words:
-        return []
+def _vocab_error(db_path, db):
+    """The error for a database whose shared vocab is missing or from another build."""
+    return ValueError(f"{db_path} needs a matching {db['vocab_file']}, which is missing or from another build; re-run vectorize_all")
 
-    word_idx = {w: i for i, w in enumerate(db["vocab"])}
-    idf = db["idf"]
 
-    # Build query vector
-    tf = {}
-    for w in words:
-        if w in word_idx:
-            tf[w] = tf.get(w, 0) + 1
-    q_vec = {str(word_idx[w]): (tf[w] / len(words)) * idf.get(w, 0) for w in tf}
+def _search_db(words, db_path, db_key, vocab_key, top_k, module_map):
+    """Enriched top hits of one database; scoring goes through _search_hits."""
+    database = Path(db_path).stem
+    return [
+        enrich_result(entry, i, similarity, database, module_map)
+        for i, similarity, entry in _search_hits(words, db_key, vocab_key, top_k)
+    ]
 
-    # Score all entries
-    scores = [(i, cosine_sim(q_vec, v)) for i, v in enumerate(db["vectors"])]
-    scores.sort(key=lambda x: -x[1])
 
-    results = []
-    for i, s in scores[:top_k]:
-        entry = db["entries"][i]
-        results.append(enrich_result(entry, i, s, database, module_map))
-    return results
+def _search(query, db_path, top_k, module_map):
+    """Internal search that reuses a provided module_id map."""
+    words = _query_words(query)
+    if not words:
+        return []
+    db_key = _file_key(db_path)
+    db = _load_db(*db_key)
+    vocab_key = _vocab_key(db_path, db)
+    if vocab_key is None:
+        raise _vocab_error(db_path, db)
+    return _search_db(words, db_path, db_key, vocab_key, top_k, module_map)
 
 
 def search(query, db_path, top_k=1):
@@ -174,27 +555,68 @@ def search(query, db_path, top_k=1):
     return _search(query, db_path, top_k, module_map)
 
 
+@lru_cache(maxsize=8)
+def _list_dats(build_dir_str, dir_mtime_ns):
+    """Sorted .dat paths in a build directory, cached until the directory changes."""
+    return tuple(sorted(Path(build_dir_str).glob('*.dat')))
+
+
 def search_all(query, build_dir, top_k=1):
     """Search all .dat databases, return top matches across all."""
-    build_dir = Path(build_dir)
+    build_dir = str(build_dir)
+    words = _query_words(query)
+    if not words:
+        return []
     module_map = load_module_id_map()
+    try:
+        dats = _list_dats(build_dir, os.stat(build_dir).st_mtime_ns)
+    except FileNotFoundError:
+        return []
+
+    # Scoring holds the GIL, but loading large uncached files is mostly reads:
+    # overlap those. Small files load faster than threads start.
+    keys = [_file_key(dat) for dat in dats]
+    misses = [key for key in keys if key not in _DB_CACHE]
+    loaded = {}
+    if len(misses) > 1 and sum(key[-1] for key in misses) >= PARALLEL_LOAD_BYTES:
+        with ThreadPoolExecutor(max_workers=min(8, len(misses))) as ex:
+            loaded = dict(zip(misses, ex.map(lambda key: _load_db(*key), misses)))
+    dbs = [loaded.get(key) or _load_db(*key) for key in keys]
+
+    # Databases built by vectorize_all share one vocab, so _query_vector's cache
+    # builds the query vector once for all of them
     results = []
-    for dat in build_dir.glob('*.dat'):
-        results.extend(_search(query, dat, top_k, module_map))
-    results.sort(key=lambda x: -x['similarity'])
-    return results[:top_k]
+    for dat, key, db in zip(dats, keys, dbs):
+        # Skip databases whose shared vocab is missing or from another build
+        vocab_key = _vocab_key(dat, db)
+        if vocab_key is None:
+            continue
+        results.extend(_search_db(words, dat, key, vocab_key, top_k, module_map))
+    return heapq.nlargest(top_k, results, key=lambda x: x['similarity'])
 
 
-def vectorize_file(source_file, build_dir):
-    """Vectorize a .txt source file and save to build directory."""
+def _read_entries(source_file):
+    """Split a .txt source into its blank-line separated entries."""
     with open(source_file, encoding='utf-8') as f:
         content = f.read()
-    
-    entries = [e.strip() for e in content.split('\n\n') if e.strip()]
+    return [e.strip() for e in content.split('\n\n') if e.strip()]
+
+
+def vectorize_file(source_file, build_dir, vocab=None):
+    """
+    Vectorize a .txt source file and save to build directory.
+
+    Pass a shared vocab (see build_global_vocab) to index against the
+    VOCAB_FILE written alongside by vectorize_all instead of embedding one.
+    """
+    entries = _read_entries(source_file)
     if not entries:
         return False
     
-    data = build_tfidf(entries)
+    data = build_tfidf(entries, vocab)
+    if vocab is not None:
+        data['vocab_file'] = VOCAB_FILE
+        data['vocab_id'] = vocab['vocab_id']
     data['entries'] = entries
     data['metadata'] = {'source': source_file.name}
     
@@ -202,32 +624,42 @@ def vectorize_file(source_file, build_dir):
     build_dir.mkdir(parents=True, exist_ok=True)
     
     out_path = build_dir / source_file.name.replace('.txt', '.dat')
-    with open(out_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    write_db(out_path, data)
     
     print(f"  {source_file.name} -> {out_path.name} ({len(entries)} entries)")
     return True
 
 
 def vectorize_all(source_dir=None, build_dir=None):
-    """Vectorize all .txt files in source directory."""
+    """Vectorize all .txt files in source directory against one shared vocab."""
     base = Path(__file__).parent
     source_dir = Path(source_dir) if source_dir else base / 'source'
     build_dir = Path(build_dir) if build_dir else base / 'vectors'
-    txt_files = list(source_dir.glob('*.txt'))
+    txt_files = sorted(source_dir.glob('*.txt'))
     if not txt_files:
         print(f"No .txt files in {source_dir}")
         return
     
     print(f"Vectorizing {len(txt_files)} files:")
-    for f in txt_files:
-        vectorize_file(f, build_dir)
+    vocab = build_global_vocab(source_dir)
+    build_dir.mkdir(parents=True, exist_ok=True)
+    vocab_bytes = json.dumps(vocab, ensure_ascii=False).encode('utf-8')
+    _atomic_write(build_dir / VOCAB_FILE, lambda f: f.write(vocab_bytes))
+    print(f"  {VOCAB_FILE} ({len(vocab['vocab'])} terms)")
+    # Files are independent and CPU-bound; fan out to processes (the GIL rules out
+    # threads). Small catalogs build faster than a pool starts, so stay serial.
+    workers = min(len(txt_files), os.cpu_count() or 1)
+    source_bytes = sum(f.stat().st_size for f in txt_files)
+    if workers > 1 and source_bytes >= PARALLEL_VECTORIZE_BYTES:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            list(ex.map(partial(vectorize_file, build_dir=build_dir, vocab=vocab), txt_files))
+    else:
+        for f in txt_files:
+            vectorize_file(f, build_dir, vocab)
     print("Done.")
 
 
 if __name__ == '__main__':
-    import sys
-
     # Backward compatible default: vectorize all .txt sources to .dat files.
     if len(sys.argv) > 1 and sys.argv[1] == "--demo-search":
         base = Path(__file__).parent